@@ -6,15 +6,21 @@ import signal
 import math
 import time
 import functools
+import logging
 import os
-from multiprocessing import Process, cpu_count
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, Future
+import sys
+from contextlib import nullcontext
+from multiprocessing import cpu_count
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, Future, FIRST_COMPLETED
 from abc import ABC, abstractmethod
 from typing import Sequence
-from enums import NodeStateEnum
+from enums import NodeStateEnum, IDLE, RUNNING, COMPLETE
 from result import ResultIO
 from node import Node
 from dag import Dag
+from memo import CallbackMemo, NodeMemo
+
+logger = logging.getLogger(__name__)
 
 
 class ConduitError(Exception):
@@ -22,22 +28,69 @@ class ConduitError(Exception):
 
 
 class Conduit(ABC):
-    def __init__(self, dag: Dag, result_io: ResultIO):
+    def __init__(self, dag: Dag, result_io: ResultIO, memo: NodeMemo | None = None):
         self.dag = dag
         self.result_io = result_io
+        self.memo = memo
+        # Results of the callbacks of the nodes with `memoize=True`, kept across the runs of the conduit
+        self.callback_memo = CallbackMemo()
 
     @abstractmethod
     def start(self, *args, **kwargs) -> None:
         pass
 
     def get_nodes(self, node_state: NodeStateEnum) -> Sequence[Node]:
-        return [node for node in self.dag.nodes if node.state == node_state]
+        return self.dag.nodes_in_state(node_state)
 
     def are_all_nodes_complete(self) -> bool:
-        return all(node.state == NodeStateEnum.COMPLETE for node in self.dag.nodes)
+        return self.dag.count_nodes_in_state(COMPLETE) == len(self.dag)
 
     def is_node_ready(self, node: Node) -> bool:
-        return all(dep.state == NodeStateEnum.COMPLETE for dep in self.dag.direct_dependencies(node))
+        return self.dag.is_node_ready(node)
+
+    def pending_dependency_counts(self) -> dict[Node, int]:
+        """Number of unfinished dependencies of every node that still has to run."""
+        return self.dag.pending_dependency_counts()
+
+    def restore_memoized(self) -> None:
+        """Reset the nodes for a new run, then mark the nodes restored by the memo (if any) as complete."""
+        for node in self.dag.nodes:
+            self.dag.set_node_state(node, IDLE)
+            # Results of a previous run must not be handed to the dependent nodes of this run
+            node._result_cache = None
+        if self.memo is not None:
+            for node in self.memo.restore(self.dag, self.result_io):
+                logger.info("[node-%s] Restored from memo.", node.label)
+            self.result_io.flush()
+
+    def store_memoized(self) -> None:
+        if self.memo is not None:
+            self.memo.store(self.dag, self.result_io)
+
+    def transfer_results(self, dest_dir: str) -> None:
+        # Nothing to transfer (nor any directory to create) for the ResultIOs that do not support it
+        if not self.result_io.supports_transfer:
+            return
+        try:
+            os.makedirs(dest_dir)
+        except FileExistsError:
+            pass
+        finally:
+            self.result_io.transfer_results(dest_dir)
+
+
+# Conduits of the `ParallelConduits` worker processes, set by the pool initializer
+_worker_conduits: list[tuple[Conduit, tuple, dict]] = []
+
+
+def _init_worker_conduits(conduits: list[tuple[Conduit, tuple, dict]]) -> None:
+    global _worker_conduits
+    _worker_conduits = conduits
+
+
+def _start_worker_conduit(idx: int) -> None:
+    conduit, start_args, start_kw = _worker_conduits[idx]
+    conduit.start(*start_args, **start_kw)
 
 
 class ParallelConduits:
@@ -48,32 +101,52 @@ class ParallelConduits:
 
         self.name = name
 
-        self._processors: list[Process] = []
+        self._conduits: list[tuple[Conduit, tuple, dict]] = []
         self._max_processors = max_processors
 
+        # With "fork" on Linux, the workers inherit the already-built conduits and their DAGs copy-on-write
+        # instead of unpickling them. Elsewhere the platform's default is kept (forking is unsafe on macOS,
+        # unavailable on Windows), and the conduits are pickled once per worker.
+        start_method = "fork" if sys.platform.startswith("linux") else None
+        self._mp_context = multiprocessing.get_context(start_method)
+
     @property
     def num_processors(self) -> int:
-        return len(self._processors)
+        return len(self._conduits)
 
     def add_conduit(self, conduit: Conduit, *start_args, **start_kw) -> None:
         if self.num_processors >= self._max_processors:
             raise ValueError("Adding a new conduit would exceed the maximum number of worker processors.")
 
-        processor = Process(
-            target=conduit.start,
-            name=f"{self.name}-{self.num_processors + 1}",
-            args=start_args,
-            kwargs=start_kw
-        )
-        self._processors.append(processor)
+        # Conduits sharing a temporary location would delete each other's results
+        result_io = conduit.result_io
+        if result_io.temp_location and not result_io.unique:
+            for other, _, _ in self._conduits:
+                if other.result_io.temp_location == result_io.temp_location:
+                    raise ValueError("The conduits must not share a temporary location. Use a ResultIO with `unique=True`.")
+
+        self._conduits.append((conduit, start_args, start_kw))
 
     def start(self) -> None:
-        for proc in self._processors:
-            print(f"Starting {proc.name} ...")
-            proc.start()
-        for proc in self._processors:
-            print(f"{proc.name} Completed.")
-            proc.join()
+        # The conduits share one pool of worker processes and are reported in order of completion
+        # Only the index of each conduit is sent to the workers, the conduits are handed over by the initializer
+        with ProcessPoolExecutor(max_workers=self._max_processors,
+                                 mp_context=self._mp_context,
+                                 initializer=_init_worker_conduits,
+                                 initargs=(self._conduits,),
+                                 ) as executor:
+            futures: dict[Future, str] = dict()
+            for idx in range(len(self._conduits)):
+                conduit_name = f"{self.name}-{idx + 1}"
+                logger.info("Starting %s ...", conduit_name)
+                futures[executor.submit(_start_worker_conduit, idx)] = conduit_name
+
+            for future in as_completed(futures):
+                try:
+                    future.result()  # Re-raise any exception from the worker process
+                except Exception as e:
+                    raise ConduitError(f"{futures[future]} failed: {e}") from e
+                logger.info("%s Completed.", futures[future])
 
 
 def create_and_delete_temp_location(create_args=(),
@@ -97,19 +170,16 @@ def create_and_delete_temp_location(create_args=(),
         def wrapper(self, *args, **kwargs):
             # Delete Temporary Location, if exists
             # Ensure that the temporary location is new
-            if hasattr(self.result_io, "delete_temp_location"):
-                self.result_io.delete_temp_location(*delete_args, **delete_kw)
+            self.result_io.delete_temp_location(*delete_args, **delete_kw)
 
             # Create Temporary Location
-            if hasattr(self.result_io, "create_temp_location"):
-                self.result_io.create_temp_location(*create_args, **create_kw)
+            self.result_io.create_temp_location(*create_args, **create_kw)
 
             try:
                 start_func(self, *args, **kwargs)
             finally:
                 # Delete Temporary Location
-                if hasattr(self.result_io, "delete_temp_location"):
-                    self.result_io.delete_temp_location(*delete_args, **delete_kw)
+                self.result_io.delete_temp_location(*delete_args, **delete_kw)
 
         return wrapper
 
@@ -117,120 +187,155 @@ def create_and_delete_temp_location(create_args=(),
 
 
 class AsyncConduit(Conduit):
-    def __init__(self, dag: Dag, result_io: ResultIO, concurrency_limit: int = 10):
-        super().__init__(dag, result_io)
+    """
+    Run the DAG on an asyncio event loop.
+
+    By default, the nodes run in the event loop's default (thread) executor. For CPU-bound callbacks, pass
+    `executor_cls=ProcessPoolExecutor` so that the callbacks run in separate processes. In that case the nodes
+    (with their callbacks and arguments) and the dependency results must be picklable. The results are still
+    read and written by this process, so any ResultIO can be used.
+    """
+    def __init__(self,
+                 dag: Dag,
+                 result_io: ResultIO,
+                 concurrency_limit: int = 10,
+                 executor_cls: type[Executor] | None = None,
+                 memo: NodeMemo | None = None,
+                 ):
+        super().__init__(dag, result_io, memo)
         self.concurrency_limit = concurrency_limit
-        self._running_nodes = set()  # Tracks currently running nodes to prevent duplicates
+
+        # Executor is created lazily in `start` with `max_workers=concurrency_limit` and shut down afterwards
+        self._executor_cls = executor_cls
+        self._executor: Executor | None = None
 
     async def _run_node_async(self, node: Node, dependencies: list[Node]) -> None:
         """Run a node's computation asynchronously."""
-        if node in self._running_nodes:
-            # Avoid duplicate execution
-            return
+        # A node is scheduled exactly once, by its last finishing dependency
+        assert node.state == IDLE, f"Node {node.label} was scheduled more than once."
 
-        self._running_nodes.add(node)
-        try:
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, node.start, dependencies, self.result_io)
-        finally:
-            self._running_nodes.remove(node)
-
-    async def _execute_ready_nodes(self, semaphore: asyncio.Semaphore) -> None:
-        """Find READY nodes and execute them asynchronously within concurrency limits."""
-        tasks = []
-        for node in self.get_nodes(NodeStateEnum.IDLE):
-            if self.is_node_ready(node):
-                print(f"[node-{node.label}] Ready for execution.")
-                dependencies = self.dag.direct_dependencies(node)
-                tasks.append(self._schedule_node_with_semaphore(node, dependencies, semaphore))
-        await asyncio.gather(*tasks)
-
-    async def _schedule_node_with_semaphore(self, node: Node, dependencies: list[Node], semaphore: asyncio.Semaphore):
+        self.dag.set_node_state(node, RUNNING)
+        # Only the callback is sent to the executor (if any), the ResultIO is used from this process
+        await asyncio.to_thread(node.start, dependencies, self.result_io, self._executor, self.callback_memo)
+        self.dag.set_node_state(node, COMPLETE)
+
+    def _create_node_task(self, node: Node, semaphore: asyncio.Semaphore | nullcontext) -> asyncio.Task:
+        """Schedule a node whose dependencies are all complete."""
+        dependencies = self.dag.direct_dependencies(node)
+        return asyncio.create_task(self._schedule_node_with_semaphore(node, dependencies, semaphore))
+
+    async def _schedule_node_with_semaphore(self, node: Node, dependencies: list[Node], semaphore: asyncio.Semaphore | nullcontext) -> Node:
         """Wrap node execution with a semaphore for concurrency control."""
         async with semaphore:
             await self._run_node_async(node, dependencies)
+        return node
 
-    async def _main_loop(self, delay=0.1) -> None:
+    async def _main_loop(self) -> None:
         """Main loop to manage DAG execution."""
-        semaphore = asyncio.Semaphore(self.concurrency_limit)  # Limit concurrent tasks
-
-        # Start source nodes (those with no dependencies)
-        source_tasks = [
-            asyncio.create_task(self._schedule_node_with_semaphore(node, [], semaphore))
-            for node in self.dag.sources
-        ]
-        await asyncio.gather(*source_tasks)
+        pending_count = self.pending_dependency_counts()
+        if not pending_count:
+            return
 
-        # Process the DAG until all nodes are complete
-        while not self.are_all_nodes_complete():
-            await self._execute_ready_nodes(semaphore)
-            await asyncio.sleep(delay)
+        # Limit concurrent tasks, unless the limit can never be reached
+        if self.concurrency_limit >= len(pending_count):
+            semaphore = nullcontext()
+        else:
+            semaphore = asyncio.Semaphore(self.concurrency_limit)
+
+        # Start the nodes without pending dependencies (i.e. the sources and the nodes whose dependencies
+        # were all restored from the memo). Every other node is scheduled by its last finishing dependency.
+        pending = {self._create_node_task(node, semaphore) for node in self.dag.ready_nodes()}
+
+        # Wake up once per finished node and schedule the successors it unblocked
+        succs = self.dag.succs
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Write out the results of the batch (for the ResultIOs that buffer them)
+            self.result_io.flush()
+            for task in done:
+                node = task.result()  # Raise any exception from the node
+                for successor in succs[node]:
+                    if successor not in pending_count:
+                        # Restored from the memo
+                        continue
+                    pending_count[successor] -= 1
+                    if pending_count[successor] == 0:
+                        logger.info("[node-%s] Ready for execution.", successor.label)
+                        pending.add(self._create_node_task(successor, semaphore))
 
     @create_and_delete_temp_location()
     def start(self, dest_dir: str | None = None) -> None:
         """Start the DAG execution."""
-        asyncio.run(self._main_loop())
+        if self._executor_cls is not None:
+            self._executor = self._executor_cls(max_workers=self.concurrency_limit)
+        try:
+            self.result_io.prepare_for_labels(self.dag.labels)
+            self.restore_memoized()
+            asyncio.run(self._main_loop())
+            self.store_memoized()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
 
-        if dest_dir and hasattr(self.result_io, "transfer_results"):
-            try:
-                os.makedirs(dest_dir)
-            except FileExistsError:
-                pass
-            finally:
-                self.result_io.transfer_results(dest_dir)
+        if dest_dir:
+            self.transfer_results(dest_dir)
 
 
 class ThreadPoolConduit(Conduit):
-    def __init__(self, dag: Dag, result_io: ResultIO, *pool_args, **pool_kwargs):
-        super().__init__(dag, result_io)
+    def __init__(self, dag: Dag, result_io: ResultIO, *pool_args, memo: NodeMemo | None = None, **pool_kwargs):
+        super().__init__(dag, result_io, memo)
         self._pool_args = pool_args
         self._pool_kwargs = pool_kwargs
-        self._submitted_nodes = set()  # Track nodes that have been submitted
-
-    def _submit_node_tasks(self, executor: ThreadPoolExecutor) -> list[Future]:
-        """Submit tasks for all nodes that are ready to execute."""
-        futures = []
-
-        # Start the source nodes
-        for src_node in self.dag.sources:
-            if src_node not in self._submitted_nodes:
-                print(f"[node-{src_node.label}] Ready for execution.")
-                self._submitted_nodes.add(src_node)  # Mark as submitted
-                futures.append(executor.submit(src_node.start, [], self.result_io))
-
-        # Keep submitting tasks for all ready nodes
-        while not self.are_all_nodes_complete():
-            for node in self.get_nodes(NodeStateEnum.IDLE):
-                if node not in self._submitted_nodes and self.is_node_ready(node):
-                    dependencies = self.dag.direct_dependencies(node)
-                    print(f"[node-{node.label}] Ready for execution.")
-                    self._submitted_nodes.add(node)  # Mark as submitted
-                    futures.append(executor.submit(node.start, dependencies, self.result_io))
-
-        return futures
+
+    def _submit_node(self, executor: ThreadPoolExecutor, node: Node, future_to_node: dict[Future, Node]) -> Future:
+        """Submit a node whose dependencies are all complete."""
+        logger.info("[node-%s] Ready for execution.", node.label)
+        self.dag.set_node_state(node, RUNNING)
+        future = executor.submit(
+            node.start, self.dag.direct_dependencies(node), self.result_io, callback_memo=self.callback_memo
+        )
+        future_to_node[future] = node
+        return future
 
     def _main_loop(self) -> None:
-        with ThreadPoolExecutor(*self._pool_args, **self._pool_kwargs) as executor:
-            # Submit tasks for source nodes and any other nodes that are ready
-            futures = self._submit_node_tasks(executor)
+        pending_count = self.pending_dependency_counts()
+        succs = self.dag.succs
+        future_to_node: dict[Future, Node] = dict()
 
-            # Wait for all tasks to complete
-            for future in as_completed(futures):
-                try:
-                    future.result()  # Wait for each task to complete and raise any exception
-                except ConduitError as e:
-                    error_message = f"Error occurred during task execution: {e}"
-                    raise ConduitError(error_message)
+        with ThreadPoolExecutor(*self._pool_args, **self._pool_kwargs) as executor:
+            # Start the nodes without pending dependencies
+            pending = {self._submit_node(executor, node, future_to_node) for node in self.dag.ready_nodes()}
+
+            # Only wake up when a node finishes, then submit the successors it unblocked
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                # Write out the results of the batch (for the ResultIOs that buffer them)
+                self.result_io.flush()
+                for future in done:
+                    node = future_to_node.pop(future)
+                    try:
+                        future.result()  # Raise any exception from the task
+                    except ConduitError as e:
+                        error_message = f"Error occurred during task execution: {e}"
+                        raise ConduitError(error_message)
+
+                    self.dag.set_node_state(node, COMPLETE)
+                    for successor in succs[node]:
+                        if successor not in pending_count:
+                            # Restored from the memo
+                            continue
+                        pending_count[successor] -= 1
+                        if pending_count[successor] == 0:
+                            pending.add(self._submit_node(executor, successor, future_to_node))
 
     @create_and_delete_temp_location()
     def start(self, dest_dir: str | None = None) -> None:
         """Start the DAG execution."""
+        self.result_io.prepare_for_labels(self.dag.labels)
+        self.restore_memoized()
         self._main_loop()
+        self.store_memoized()
 
-        if dest_dir and hasattr(self.result_io, "transfer_results"):
-            try:
-                os.makedirs(dest_dir)
-            except FileExistsError:
-                pass
-            finally:
-                self.result_io.transfer_results(dest_dir)
+        if dest_dir:
+            self.transfer_results(dest_dir)
@@ -1,114 +1,252 @@
 import functools
 import inspect
+from array import array
 from collections import deque
+from types import MappingProxyType
 from typing import Sequence, Tuple
 
+from enums import NodeStateEnum, IDLE, COMPLETE
 from node import Node
 
 
-def _remove_duplicates(lst: list) -> list:
-    unique_list = []
-    for item in lst:
-        if item not in unique_list:
-            unique_list.append(item)
-    return unique_list
-
-
 class Dag:
     def __init__(self, arcs: Sequence[Tuple[Node, Node]] | None = None):
-        self.arcs: Sequence[Tuple[Node, Node]] = arcs or []
+        self.arcs: list[Tuple[Node, Node]] = []
+
+        # Adjacency caches, kept in sync with `self.arcs` by `_index_arc`.
+        # Dictionaries with `None` values are used as insertion-ordered sets. The adjacency is stored
+        # as tuples so that it can be handed out to callers without copying (nor being modified).
+        self._preds: dict[Node, tuple[Node, ...]] = dict()
+        self._succs: dict[Node, tuple[Node, ...]] = dict()
+        self._nodes: dict[Node, None] = dict()
+        self._sources: dict[Node, None] = dict()
+        self._sinks: dict[Node, None] = dict()
+        # Nodes grouped by their state, updated through `set_node_state`
+        self._by_state: dict[NodeStateEnum, dict[Node, None]] = {state: dict() for state in NodeStateEnum}
+        # Nodes by label. Labels should be unique, but a list is kept to detect duplicates on lookup.
+        self._label_index: dict[str, list[Node]] = dict()
+
+        # Struct-of-arrays view of the nodes for the scheduler sweeps. Every node gets a position `idx`
+        # in the DAG (`self._index`), which indexes the packed arrays below:
+        #   `states`: the NodeStateEnum of the node, updated through `set_node_state`
+        #   `indegrees`: the number of direct dependencies of the node
+        #   `pending`: the number of direct dependencies of the node that are not complete
+        self._index: dict[Node, int] = dict()
+        self._node_list: list[Node] = []
+        self.labels: list[str] = []
+        self.states = array("b")
+        self.indegrees = array("i")
+        self.pending = array("i")
+
+        for src_node, dst_node in arcs or []:
+            self._index_arc(src_node, dst_node)
+
+        # Cached topological order with the position of each node in it. Positions only need to
+        # be increasing along the order, so nodes can be prepended/appended without renumbering.
+        # `None` means the order is stale and is recomputed on the next access.
+        self._topo: list[Node] | None = None if self.arcs else []
+        self._topo_pos: dict[Node, int] = dict()
+
+    def _index_arc(self, src_node: Node, dst_node: Node) -> None:
+        for node in (src_node, dst_node):
+            if node not in self._nodes:
+                self._nodes[node] = None
+                self._preds[node] = ()
+                self._succs[node] = ()
+                self._sources[node] = None
+                self._sinks[node] = None
+                self._by_state[node.state][node] = None
+                self._label_index.setdefault(node.label, []).append(node)
+                self._index[node] = len(self._node_list)
+                self._node_list.append(node)
+                self.labels.append(node.label)
+                self.states.append(node.state)
+                self.indegrees.append(0)
+                self.pending.append(0)
+
+        self.arcs.append((src_node, dst_node))
+        self._succs[src_node] += (dst_node,)
+        self._preds[dst_node] += (src_node,)
+        dst_idx = self._index[dst_node]
+        self.indegrees[dst_idx] += 1
+        if self.states[self._index[src_node]] != COMPLETE:
+            self.pending[dst_idx] += 1
+
+        # The destination now has a dependency and the source now has a neighbor
+        self._sources.pop(dst_node, None)
+        self._sinks.pop(src_node, None)
 
     @property
     def sources(self) -> Sequence[Node]:
-        return _remove_duplicates(
-            [x for x, _ in self.arcs if all((y, x) not in self.arcs for y, _ in self.arcs if y != x)])
+        return list(self._sources)
 
     @property
     def sinks(self) -> Sequence[Node]:
-        return _remove_duplicates(
-            [y for _, y in self.arcs
-             if all((y, x) not in self.arcs
-                    for _, x in self.arcs if x != y)]
-        )
+        return list(self._sinks)
 
     @property
     def nodes(self) -> Sequence[Node]:
-        return _remove_duplicates([x for x, _ in self.arcs] + [y for _, y in self.arcs])
+        return list(self._nodes)
+
+    @property
+    def indegree(self) -> dict[Node, int]:
+        """Number of direct dependencies of every node (a new dictionary, free to be modified)."""
+        return dict(zip(self._node_list, self.indegrees))
+
+    @property
+    def succs(self) -> MappingProxyType:
+        """Read-only view of the direct neighbors of every node (as tuples)."""
+        return MappingProxyType(self._succs)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def nodes_in_state(self, node_state: NodeStateEnum) -> Sequence[Node]:
+        return list(self._by_state[node_state])
+
+    def count_nodes_in_state(self, node_state: NodeStateEnum) -> int:
+        return len(self._by_state[node_state])
+
+    def set_node_state(self, node: Node, new_state: NodeStateEnum) -> None:
+        """Set the state of a node and move it to the matching state bucket."""
+        self._is_in_dag(node)
+        idx = self._index[node]
+        old_state = self.states[idx]
+        if old_state != new_state:
+            self._by_state[old_state].pop(node, None)
+            # Keep the pending dependency counts of the neighbors in sync
+            if old_state == COMPLETE or new_state == COMPLETE:
+                delta = 1 if old_state == COMPLETE else -1
+                for neighbor in self._succs[node]:
+                    self.pending[self._index[neighbor]] += delta
+            self.states[idx] = new_state
+        self._by_state[new_state][node] = None
+        node.set_state(new_state)
+
+    def pending_dependency_counts(self) -> dict[Node, int]:
+        """Number of unfinished dependencies of every node that is not complete."""
+        return {
+            node: count
+            for node, state, count in zip(self._node_list, self.states, self.pending) if state != COMPLETE
+        }
+
+    def ready_nodes(self) -> Sequence[Node]:
+        """Idle nodes whose dependencies are all complete."""
+        nodes, states, pending = self._node_list, self.states, self.pending
+        return [nodes[idx] for idx in range(len(nodes)) if states[idx] == IDLE and pending[idx] == 0]
+
+    def is_node_ready(self, node: Node) -> bool:
+        self._is_in_dag(node)
+        return self.pending[self._index[node]] == 0
 
     @property
     def node_labels(self) -> Sequence[str]:
-        return [node.label for node in self.nodes]
+        return [node.label for node in self._nodes]
 
     def __getitem__(self, label: str | Tuple[str, str]) -> Node | Tuple[Node, Node]:
         if isinstance(label, str):  # Returns a Node
-            lst = [node for node in self.nodes if node.label == label]
+            lst = self._label_index.get(label, [])
             assert len(lst) == 1, "Node does not exist with the given label"
             return lst[0]
         elif isinstance(label, tuple):  # Returns Tuple[Node, Node]
             src_label = label[0]
             dst_label = label[1]
-            lst = list(filter(lambda tup: tup[0] == src_label and tup[1] == dst_label, self.arcs))
+            # Look up the arc through the adjacency of the source nodes instead of scanning all the arcs
+            lst = [
+                (src_node, dst_node)
+                for src_node in self._label_index.get(src_label, [])
+                for dst_node in self._succs[src_node] if dst_node.label == dst_label
+            ]
             assert len(lst) == 1, "Arc does not exist with the given source & destination labels."
             return lst[0]
 
     def add_arc(self, src_node: Node, dst_node: Node) -> "Dag":
-        if self.nodes and (src_node not in self.nodes) and (dst_node not in self.nodes):
+        if self._nodes and (src_node not in self._nodes) and (dst_node not in self._nodes):
             raise ValueError("One of the given nodes must be in the DAG.")
 
-        temp_dag = Dag(arcs=[*self.arcs, (src_node, dst_node)])
-        self.topological_sort(temp_dag)
-        # self.arcs = [*self.arcs, (src_node, dst_node)]
-        self.arcs = temp_dag.arcs
+        # The new arc closes a cycle only if the source is already reachable from the destination
+        if src_node is dst_node or self._is_reachable(dst_node, src_node):
+            raise ValueError("Cycle detected.")
+
+        is_new_src = src_node not in self._nodes
+        is_new_dst = dst_node not in self._nodes
+        self._index_arc(src_node, dst_node)
+
+        if self._topo is not None:
+            if is_new_src:
+                # A new source node has no dependencies, so it can go first
+                self._topo_pos[src_node] = self._topo_pos[self._topo[0]] - 1 if self._topo else 0
+                self._topo.insert(0, src_node)
+            if is_new_dst:
+                # A new destination node has no neighbors, so it can go last
+                self._topo_pos[dst_node] = self._topo_pos[self._topo[-1]] + 1 if self._topo else 0
+                self._topo.append(dst_node)
+            if self._topo_pos[src_node] > self._topo_pos[dst_node]:
+                self._topo = None
         return self
 
-    @staticmethod
-    def topological_sort(dag: "Dag") -> Sequence[Node]:
-        sorted_nodes = deque()
-        visited = []
-        temp_visited = []
-
-        def visit(node: Node):
-            nonlocal sorted_nodes, visited, temp_visited
-            if node in visited:
-                return
-            if node in temp_visited:
-                raise RecursionError(f"Cycle detected.")
+    def _is_reachable(self, src_node: Node, dst_node: Node) -> bool:
+        stack = [src_node]
+        seen = {src_node}
+        while stack:
+            node = stack.pop()
+            if node is dst_node:
+                return True
+            for neighbor in self._succs.get(node, ()):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    stack.append(neighbor)
+        return False
 
-            temp_visited.append(node)
-
-            # Visit all neighbors (children in the dependency graph)
-            for neighbor in (neighbor for src, neighbor in dag.arcs if src == node):
-                visit(neighbor)
-
-            temp_visited.remove(node)
-            visited.append(node)
-            sorted_nodes.appendleft(node)
+    @property
+    def topological_order(self) -> Sequence[Node]:
+        if self._topo is None:
+            self._topo = list(self.topological_sort(self))
+            self._topo_pos = {node: idx for idx, node in enumerate(self._topo)}
+        return list(self._topo)
 
-        # Process all nodes in the DAG
-        for dag_node in dag.nodes:
-            if dag_node not in visited:
-                visit(dag_node)
+    @staticmethod
+    def topological_sort(dag: "Dag") -> Sequence[Node]:
+        # Kahn's algorithm: repeatedly take the nodes whose dependencies have all been taken
+        in_degree = dag.indegree
+        queue = deque(node for node, degree in in_degree.items() if degree == 0)
+        sorted_nodes = []
+        while queue:
+            node = queue.popleft()
+            sorted_nodes.append(node)
+            for neighbor in dag._succs[node]:
+                in_degree[neighbor] -= 1
+                if in_degree[neighbor] == 0:
+                    queue.append(neighbor)
+
+        # Nodes on a cycle never reach an in-degree of zero
+        if len(sorted_nodes) != len(in_degree):
+            raise ValueError("Cycle detected.")
 
         return sorted_nodes
 
     def all_dependencies(self, node: Node) -> Sequence[Node]:
-        out_set = []
-        for path in self.enumerate_paths():
-            if node in path:
-                idx = path.index(node)
-                out_set += path[:idx]
-        return out_set
+        # Breadth-first walk over the predecessors, nearest dependencies first
+        seen: dict[Node, None] = dict()
+        queue = deque([node])
+        while queue:
+            current = queue.popleft()
+            for dependency in self._preds.get(current, ()):
+                if dependency not in seen:
+                    seen[dependency] = None
+                    queue.append(dependency)
+        return list(seen)
 
     def _is_in_dag(self, node: Node) -> None:
-        if node not in self.nodes:
+        if node not in self._nodes:
             raise ValueError("The given node does not belong to the DAG.")
 
     def direct_dependencies(self, node: Node) -> Sequence[Node]:
-        return [x for x, y in self.arcs if y == node]
+        return self._preds.get(node, ())
 
     def neighbors(self, node: Node) -> Sequence[Node]:
         self._is_in_dag(node)
-        return [y for x, y in self.arcs if x == node]
+        return self._succs[node]
 
     def enumerate_paths(self) -> Sequence[Sequence[Node]]:
         out_list: list[tuple[Node]] = []
@@ -158,7 +296,7 @@ def node_registrator(dag: Dag,
         result_kind = sig.return_annotation
         if result_kind is inspect.Signature.empty:
             raise TypeError("Provide a type hint for the callback return with a result_kind.")
-        node = dag[label] if label in dag.node_labels\
+        node = dag[label] if label in dag._label_index\
             else Node(
                 label,
                 cb_func,
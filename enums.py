@@ -1,7 +1,14 @@
-from enum import Enum
+from enum import IntEnum
 
 
-class NodeStateEnum(Enum):
-    IDLE = 1
-    RUNNING = 2
-    COMPLETE = 3
+class NodeStateEnum(IntEnum):
+    IDLE = 0
+    RUNNING = 1
+    COMPLETE = 2
+
+
+# Module-level aliases of the states for the hot paths. Reading `NodeStateEnum.COMPLETE` goes through
+# the enum metaclass, which is several times slower than reading a module global.
+IDLE = NodeStateEnum.IDLE
+RUNNING = NodeStateEnum.RUNNING
+COMPLETE = NodeStateEnum.COMPLETE
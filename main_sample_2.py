@@ -1,5 +1,6 @@
 import time
 import random
+import logging
 from pathlib import Path
 from dataclasses import dataclass
 
@@ -8,6 +9,9 @@ from result import JsonResult, LocalResultIO
 from dag import Dag, node_registrator
 from node import Node
 
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
 TEMP_DIR = str(Path(__file__).resolve().parent / ".tmp")
 
 
@@ -20,9 +24,9 @@ class CustomResult(JsonResult):
 # Define a callback for Source nodes
 def my_callback(node: Node, dep_results: dict[str, CustomResult], message=None) -> CustomResult:
     if message:
-        print(f"[node-{node.label}] Dependency Results - {dep_results} | Message: {message}")
+        logger.info("[node-%s] Dependency Results - %s | Message: %s", node.label, dep_results, message)
     else:
-        print(f"[node-{node.label}] Dependency Results - {dep_results}")
+        logger.info("[node-%s] Dependency Results - %s", node.label, dep_results)
     # Simulate long-running process
     time.sleep(random.randint(1, 4))
     return CustomResult(f"{node.label}-stdout", f"{node.label}-stderr")
@@ -38,7 +42,7 @@ node_2 = Node("2", my_callback, CustomResult, message="Hello World")
 
 def _cb_func(node, dep_results):
     res = CustomResult(f"{node.label}-stdout", f"{node.label}-stderr")
-    print(f"[node-{node.label}] {dep_results}")
+    logger.info("[node-%s] %s", node.label, dep_results)
     return res
 
 
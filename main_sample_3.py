@@ -2,15 +2,16 @@
 """
 import time
 import random
-from pathlib import Path
+import logging
 from dataclasses import dataclass
 
 from conduit import AsyncConduit
-from result import JsonResult, LocalResultIO
+from result import JsonResult, MemoryResultIO
 from dag import Dag, node_registrator
 from node import Node
 
-TEMP_DIR = str(Path(__file__).resolve().parent / ".tmp")
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -28,9 +29,9 @@ class CustomResultB(JsonResult):
 # Define a callback for Source nodes
 def my_callback(node: Node, dep_results: dict[str, CustomResult], message=None) -> CustomResult:
     if message:
-        print(f"[node-{node.label}] Dependency Results - {dep_results} | Message: {message}")
+        logger.info("[node-%s] Dependency Results - %s | Message: %s", node.label, dep_results, message)
     else:
-        print(f"[node-{node.label}] Dependency Results - {dep_results}")
+        logger.info("[node-%s] Dependency Results - %s", node.label, dep_results)
     # Simulate long-running process
     time.sleep(random.randint(1, 4))
     return CustomResult(f"{node.label}-stdout", f"{node.label}-stderr")
@@ -47,7 +48,7 @@ node_2 = Node("2", my_callback, CustomResult, message="Hello World")
 def _cb_func(node, dep_results):
     res = CustomResultB(f"{node.label}-stdout")
     # print(f"[node-{node.label}] {dep_results}")
-    print(f"[node-{node.label}] {res}")
+    logger.info("[node-%s] %s", node.label, res)
     return res
 
 
@@ -86,6 +87,6 @@ for src, dst in dag.arcs:
     print(f"{src} --> {dst}")
 print()
 
-res_io = LocalResultIO(TEMP_DIR)
+res_io = MemoryResultIO()
 async_conduit = AsyncConduit(dag, res_io)
 async_conduit.start()
@@ -2,6 +2,7 @@
 
 import time
 import random
+import logging
 from pathlib import Path
 from dataclasses import dataclass
 
@@ -10,6 +11,9 @@ from result import JsonResult, LocalResultIO
 from dag import Dag
 from node import Node
 
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
 TEMP_DIR = str(Path(__file__).resolve().parent / ".tmp")
 
 
@@ -21,9 +25,9 @@ class CustomResult(JsonResult):
 
 def my_callback(node: Node, dep_results: dict[str, CustomResult], message=None) -> CustomResult:
     if message:
-        print(f"[node-{node.label}] Dependency Results - {dep_results} | Message: {message}")
+        logger.info("[node-%s] Dependency Results - %s | Message: %s", node.label, dep_results, message)
     else:
-        print(f"[node-{node.label}] Dependency Results - {dep_results}")
+        logger.info("[node-%s] Dependency Results - %s", node.label, dep_results)
     # Simulate long-running process
     time.sleep(random.randint(1, 4))
     return CustomResult(f"{node.label}-stdout", f"{node.label}-stderr")
@@ -1,15 +1,15 @@
 import time
 import random
-from pathlib import Path
+import logging
 from dataclasses import dataclass
 
 from conduit import AsyncConduit, ParallelConduits
-from result import JsonResult, LocalResultIO
+from result import JsonResult, MemoryResultIO
 from dag import Dag
 from node import Node
 
-
-TEMP_DIR = str(Path(__file__).resolve().parent / ".tmp")
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -20,9 +20,9 @@ class CustomResult(JsonResult):
 
 def my_callback(node: Node, dep_results: dict[str, CustomResult], message=None) -> CustomResult:
     if message:
-        print(f"[node-{node.label}] Dependency Results - {dep_results} | Message: {message}")
+        logger.info("[node-%s] Dependency Results - %s | Message: %s", node.label, dep_results, message)
     else:
-        print(f"[node-{node.label}] Dependency Results - {dep_results}")
+        logger.info("[node-%s] Dependency Results - %s", node.label, dep_results)
     return CustomResult(f"{node.label}-stdout", f"{node.label}-stderr")
 
 
@@ -58,7 +58,7 @@ def main():
     parallel_conduits = ParallelConduits("my-parallel-conduits", max_processors=max_processors)
     for _ in range(max_processors):
         dag = create_dag()
-        res_io = LocalResultIO()
+        res_io = MemoryResultIO()
         async_conduit = AsyncConduit(dag, res_io)
         parallel_conduits.add_conduit(async_conduit)
 
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from dag import Dag
+from enums import NodeStateEnum
+from node import Node
+from result import Result, ResultIO
+
+
+class NodeMemo:
+    """
+    Memoize node results across conduit runs.
+
+    Each node is identified by a fingerprint of its inputs (see `Node.fingerprint`). After a run, the result of every
+    node is stored in `cache_dir` under its fingerprint, together with an index of the fingerprint of each node label.
+    On the next run, a node whose fingerprint is unchanged is restored from the cache and marked as complete instead of
+    being executed again. Only the cached results listed in the previous index are ever deleted from `cache_dir`.
+
+    Note: The callback is identified by its qualified name, so changes to the callback's code are not detected.
+    """
+    index_file_name: str = "index.json"
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir).resolve()
+
+    @staticmethod
+    def fingerprints(dag: Dag) -> dict[Node, str]:
+        out: dict[Node, str] = dict()
+        for node in dag.topological_order:
+            out[node] = node.fingerprint([out[dependency] for dependency in dag.direct_dependencies(node)])
+        return out
+
+    def _read_index(self) -> dict[str, str]:
+        index_path = self.cache_dir / self.index_file_name
+        if not index_path.exists():
+            return dict()
+        return json.loads(index_path.read_text())
+
+    def _cache_paths(self, fingerprint: str) -> tuple[Path, Path]:
+        # Results serialized to `bytes` are stored with a `.bin` suffix, so that they are deserialized from `bytes`
+        return self.cache_dir / fingerprint, self.cache_dir / f"{fingerprint}.bin"
+
+    def restore(self, dag: Dag, result_io: ResultIO) -> list[Node]:
+        """Write the cached results of the unchanged nodes to `result_io` and mark those nodes as complete."""
+        index = self._read_index()
+        restored = []
+        for node, fingerprint in self.fingerprints(dag).items():
+            if index.get(node.label) != fingerprint:
+                continue
+            text_path, binary_path = self._cache_paths(fingerprint)
+            if binary_path.exists():
+                result = node.result_kind.deserialize(binary_path.read_bytes())
+            elif text_path.exists():
+                result = node.result_kind.deserialize(text_path.read_bytes().decode())
+            else:
+                continue
+
+            result_io.write_result(result, node.label)
+            node._result_cache = result
+            dag.set_node_state(node, NodeStateEnum.COMPLETE)
+            restored.append(node)
+        return restored
+
+    def store(self, dag: Dag, result_io: ResultIO) -> None:
+        """Cache the results of a completed run and drop the cached results that are no longer referenced."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        previous_index = self._read_index()
+        index: dict[str, str] = dict()
+        for node, fingerprint in self.fingerprints(dag).items():
+            text_path, binary_path = self._cache_paths(fingerprint)
+            if not text_path.exists() and not binary_path.exists():
+                payload = result_io.read_result(node.label, node.result_kind).serialize()
+                if isinstance(payload, str):
+                    text_path.write_bytes(payload.encode())
+                else:
+                    binary_path.write_bytes(payload)
+            index[node.label] = fingerprint
+
+        fingerprints = set(index.values())
+        for fingerprint in set(previous_index.values()) - fingerprints:
+            for path in self._cache_paths(fingerprint):
+                path.unlink(missing_ok=True)
+
+        (self.cache_dir / self.index_file_name).write_text(json.dumps(index))
+
+
+class CallbackMemo:
+    """
+    Memoize callback results in memory, keyed by the node label and a hash of the node's dependency results.
+
+    The conduits hold one and use it for the nodes created with `memoize=True`, so that running a DAG again only calls
+    the callbacks whose dependency results changed. Once `max_size` results are held, the oldest ones are evicted
+    first.
+
+    Note: Nodes that do not use their dependency results (`use_dependency_results=False`) are only called once.
+    """
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self._results: dict[tuple[str, bytes], Result] = dict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(node_label: str, dependency_results: dict[str, Result]) -> tuple[str, bytes]:
+        hasher = hashlib.blake2b(digest_size=16)
+        for label in sorted(dependency_results):
+            payload = dependency_results[label].serialize()
+            if isinstance(payload, str):
+                payload = payload.encode()
+            for part in (label.encode(), payload):
+                hasher.update(len(part).to_bytes(8, "little"))
+                hasher.update(part)
+        return node_label, hasher.digest()
+
+    def get(self, key: tuple[str, bytes]) -> Result | None:
+        return self._results.get(key)
+
+    def put(self, key: tuple[str, bytes], result: Result) -> None:
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > self.max_size:
+                del self._results[next(iter(self._results))]
@@ -1,55 +1,84 @@
-import functools
-from typing import Callable, Dict
+import hashlib
+import logging
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Callable, Dict, Sequence
 
-from enums import NodeStateEnum
+from enums import NodeStateEnum, IDLE, RUNNING, COMPLETE
 from result import *
 
+if TYPE_CHECKING:
+    from memo import CallbackMemo
 
-def update_node_state(start_func):
-    """Decorator for Node.start method to automatically update its state from RUNNING to COMPLETE."""
-    @functools.wraps(start_func)
-    def wrapper(self, *args, **kwargs):
-        assert isinstance(self, Node)
-
-        # Set NodeStateEnum to NodeStateEnum.RUNNING
-        self.set_state(NodeStateEnum.RUNNING)
-
-        result = start_func(self, *args, **kwargs)
-
-        # Set NodeStateEnum to NodeStateEnum.COMPLETE
-        self.set_state(NodeStateEnum.COMPLETE)
-        return result
-    return wrapper
+logger = logging.getLogger(__name__)
 
 
 class Node:
+    # No per-instance `__dict__`, as large DAGs hold many nodes
+    __slots__ = (
+        "label",
+        "callback",
+        "result_kind",
+        "state",
+        "_use_dependency_results",
+        "_memoize",
+        "_cb_args",
+        "_cb_kwargs",
+        "_result_cache",
+    )
+
     def __init__(self,
                  label: str,
                  callback: Callable[["Node", Dict[str, Result]], Result],
                  result_kind: type[Result],
                  *cb_args,
                  use_dependency_results: bool = True,
+                 memoize: bool = False,
                  **cb_kwargs
                  ) -> None:
         self.label = label
         self.callback = callback
         self.result_kind = result_kind
-        self.state: NodeStateEnum = NodeStateEnum.IDLE
+        self.state: NodeStateEnum = IDLE
 
         self._use_dependency_results = use_dependency_results
+        # Reuse the result of a previous call with the same dependency results (see `CallbackMemo`)
+        self._memoize = memoize
         self._cb_args = cb_args
         self._cb_kwargs = cb_kwargs
+        # Single-slot cache of the node's latest result, so that the nodes depending on it can skip the ResultIO
+        self._result_cache: Result | None = None
 
     def __str__(self) -> str:
         return self.label
 
+    def fingerprint(self, dependency_fingerprints: Sequence[str]) -> str:
+        """Hash of everything that determines the node's result, including the fingerprints of its dependencies."""
+        hasher = hashlib.blake2b(digest_size=16)
+        for part in (
+            self.label,
+            f"{self.callback.__module__}.{getattr(self.callback, '__qualname__', repr(self.callback))}",
+            f"{self.result_kind.__module__}.{self.result_kind.__qualname__}",
+            repr(self._cb_args),
+            repr(sorted(self._cb_kwargs.items())),
+            repr(self._use_dependency_results),
+            *sorted(dependency_fingerprints),
+        ):
+            hasher.update(part.encode())
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
     def set_state(self, new_state: NodeStateEnum) -> NodeStateEnum:
         self.state = new_state
         return self.state
 
-    @update_node_state
-    def start(self, dependencies: list["Node"], result_io: ResultIO) -> None:
-        print(f"[node-{self.label}] Running.")
+    def start(self,
+              dependencies: list["Node"],
+              result_io: ResultIO,
+              executor: Executor | None = None,
+              callback_memo: "CallbackMemo | None" = None,
+              ) -> None:
+        self.state = RUNNING
+        logger.info("[node-%s] Running.", self.label)
 
         # Get the Results from Dependencies
         # Note: If `self._use_dependency_results=False`, then `dependency_results` is an empty dictionary. This is to avoid
@@ -59,15 +88,36 @@ class Node:
         # and cannot be used for processing as it may throw a `KeyError` due to the dictionary being empty.
         dependency_results = dict()
         if self._use_dependency_results:
-            dependency_results: dict[str, Result] = \
-                {dependency.label: result_io.read_result(dependency.label, dependency.result_kind) for dependency in dependencies}
-
-        # Perform Processing and get Result object
-        result = self.callback(self, dependency_results, *self._cb_args, **self._cb_kwargs)
-        if not isinstance(result, self.result_kind):
-            raise TypeError("The result of the node is not the same as the declared result kind.")
+            # Note: The conduits always cache the dependency results on the dependency nodes (including the ones
+            # restored from a memo). The ResultIO is only a fallback, for callers of `start` outside the conduits.
+            dependency_results: dict[str, Result] = {
+                dependency.label: dependency._result_cache if dependency._result_cache is not None
+                else result_io.read_result(dependency.label, dependency.result_kind)
+                for dependency in dependencies
+            }
+
+        # Skip the callback if it already ran with the same dependency results
+        result = None
+        memo_key = None
+        if self._memoize and callback_memo is not None:
+            memo_key = callback_memo.key(self.label, dependency_results)
+            result = callback_memo.get(memo_key)
+
+        if result is None:
+            # Perform Processing and get Result object
+            # Note: With an `executor` (e.g. a process pool for CPU-bound callbacks), only the callback runs in it.
+            if executor is None:
+                result = self.callback(self, dependency_results, *self._cb_args, **self._cb_kwargs)
+            else:
+                result = executor.submit(self.callback, self, dependency_results, *self._cb_args, **self._cb_kwargs).result()
+            # Note: The check is skipped with `python -O`
+            assert isinstance(result, self.result_kind), "The result of the node is not the same as the declared result kind."
+            if memo_key is not None:
+                callback_memo.put(memo_key, result)
 
         # Store Result object with ResultIO
         result_io.write_result(result, self.label)
+        self._result_cache = result
 
-        print(f"[node-{self.label}] Done.")
+        logger.info("[node-%s] Done.", self.label)
+        self.state = COMPLETE
@@ -1,12 +1,24 @@
+import functools
+import hashlib
 import json
+import math
 import os
+import pickle
 import shutil
+import struct
 import tempfile
+import threading
 import uuid
+from multiprocessing import resource_tracker, shared_memory
 from pathlib import Path
-from typing import AnyStr, Optional
-from dataclasses import dataclass, asdict
-from abc import ABC, ABCMeta, abstractmethod
+from typing import Any, AnyStr, Callable, Iterable, Optional
+from dataclasses import dataclass, asdict, fields, is_dataclass
+from abc import ABC, abstractmethod
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library `json` is used without it
+    orjson = None
 
 
 @dataclass
@@ -21,45 +33,142 @@ class Result(ABC):
         pass
 
 
-class JsonResultMeta(ABCMeta):
-    # Important: We assume that the dictionary is JSON Serializable!
-    def __new__(mcls, name: str, bases: tuple, attrs: dict):
-        # Add to_json() and from_json() methods to a subclass of Result
-        attrs["to_json"] = mcls.to_json
-        attrs["from_json"] = classmethod(mcls.from_json)
-
-        new_cls = super().__new__(mcls, name, bases, attrs)
-        return new_cls
-
-    @staticmethod
-    def to_json(self, *args, **kwargs) -> str:
-        # Assert that `self` is a Result (i.e. dataclass)
-        assert isinstance(self, Result)
-        return json.dumps(asdict(self), *args, **kwargs)
-
-    @staticmethod
-    def from_json(cls, json_str: str, *args, **kwargs) -> Result:
-        dct = dict(json.loads(json_str, *args, **kwargs))
-        return cls(**dct)
+@functools.cache
+def _field_names(cls: type) -> frozenset[str]:
+    return frozenset(field.name for field in fields(cls))
+
+
+def _has_non_finite(obj: Any) -> bool:
+    # orjson writes NaN and infinities as `null`, so the results holding any are left to the standard library
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    elif is_dataclass(obj) and not isinstance(obj, type):
+        values = (getattr(obj, field.name) for field in fields(obj))
+    else:
+        return False
+    return any(map(_has_non_finite, values))
+
+
+# Constructors from dictionaries of the fields, generated for every `JsonResult` kind on first use
+# (the fields do not exist yet in `__init_subclass__`, which runs before `dataclass`)
+_dict_constructors: dict[type, Callable[[dict], Any]] = dict()
+
+
+def _make_dict_constructor(cls: type) -> Callable[[dict], Any]:
+    # The generated constructor assigns the fields directly like the `__init__` generated by `dataclass`, which is
+    # faster than `cls(**d)`. The latter is still used for missing fields (i.e. defaults) or unexpected fields (i.e.
+    # the usual `TypeError`), and for the classes that need more than their fields assigned (e.g. a custom
+    # `__init__` or a `__post_init__`).
+    cls_fields = fields(cls)
+    init_code = getattr(cls.__init__, "__code__", None)
+    if (
+        hasattr(cls, "__post_init__")
+        or cls.__new__ is not object.__new__
+        or not all(field.init for field in cls_fields)
+        or init_code is None or init_code.co_filename != "<string>"  # Not generated by `dataclass`
+    ):
+        return lambda d: cls(**d)
+
+    lines = [
+        "def from_dict(d):",
+        f"    if len(d) != {len(cls_fields)}:",
+        "        return cls(**d)",
+        "    try:",
+        "        self = new(cls)",
+        *(f"        self.{field.name} = d[{field.name!r}]" for field in cls_fields),
+        "    except KeyError:",
+        "        return cls(**d)",
+        "    return self",
+    ]
+    namespace: dict[str, Any] = {"new": object.__new__, "cls": cls}
+    exec("\n".join(lines), namespace)
+    return namespace["from_dict"]
 
 
 @dataclass
 class JsonResult(Result):
     @classmethod
-    def deserialize(cls, obj_str: str, *args, **kwargs) -> "JsonResult":
+    def deserialize(cls, obj_str: AnyStr, *args, **kwargs) -> "JsonResult":
+        # Note: Not parsed with orjson, which reads the integers larger than 64-bit as floats
         dct = json.loads(obj_str, *args, **kwargs)
-        return cls(**dct)
+        from_dict = _dict_constructors.get(cls)
+        if from_dict is None:
+            from_dict = _dict_constructors[cls] = _make_dict_constructor(cls)
+        return from_dict(dct)
 
     def serialize(self, *args, **kwargs) -> str:
-        return json.dumps(asdict(self), *args, **kwargs)
+        if not args and not kwargs:
+            return self.serialize_bytes().decode()
+        return self._json_dumps(*args, **kwargs)
+
+    def serialize_bytes(self) -> bytes:
+        """Same as `serialize()`, encoded to UTF-8 (without going through `str` when orjson is available)."""
+        if orjson is not None:
+            dct = self._fields_dict()
+            if not _has_non_finite(dct):
+                try:
+                    # Nested dataclasses are passed to `asdict`, as orjson would skip their fields starting with `_`
+                    return orjson.dumps(dct, default=asdict, option=orjson.OPT_PASSTHROUGH_DATACLASS)
+                except orjson.JSONEncodeError:
+                    # e.g. integers larger than 64-bit, which the standard library supports
+                    pass
+        return self._json_dumps().encode()
+
+    def _fields_dict(self) -> dict[str, Any]:
+        # Flat results (i.e. the common case) are dumped as they are, without the deep copy made by `asdict`.
+        # The instance dictionary is only used if it holds exactly the fields (e.g. not for slotted dataclasses,
+        # nor with other attributes set in `__post_init__`).
+        dct = getattr(self, "__dict__", None)
+        if dct is not None and dct.keys() == _field_names(type(self)):
+            return dct
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+    def _json_dumps(self, *args, **kwargs) -> str:
+        try:
+            return json.dumps(self._fields_dict(), *args, **kwargs)
+        except TypeError:
+            # e.g. nested dataclasses, which are converted to dictionaries by `asdict`
+            return json.dumps(asdict(self), *args, **kwargs)
+
+    # Important: We assume that the dictionary is JSON Serializable!
+    def to_json(self, *args, **kwargs) -> str:
+        return self._json_dumps(*args, **kwargs)
+
+    @classmethod
+    def from_json(cls, json_str: str, *args, **kwargs) -> "JsonResult":
+        dct = dict(json.loads(json_str, *args, **kwargs))
+        return cls(**dct)
+
+
+def _default_temp_root() -> Path:
+    # A temporary directory set in the environment (i.e. the variables read by `tempfile`) is always
+    # respected. Otherwise, prefer a memory-backed filesystem (tmpfs) for the results, when available.
+    if not any(os.environ.get(name) for name in ("TMPDIR", "TEMP", "TMP")):
+        shm_dir = Path("/dev/shm")
+        if shm_dir.is_dir() and os.access(shm_dir, os.W_OK):
+            return shm_dir
+    return Path(tempfile.gettempdir()).resolve()
 
 
 class ResultIO(ABC):
-    def __init__(self, temp_location: Optional[str] = None, name_prefix: str = "dag"):
+    # Whether `transfer_results` moves the results to a destination directory (the conduits only
+    # create the destination directory for the ResultIOs that do)
+    supports_transfer: bool = False
+
+    def __init__(self, temp_location: Optional[str] = None, name_prefix: str = "dag", unique: bool = False):
         temp_dir_name = f"{name_prefix}-{uuid.uuid4()}"
-        root_temp_dir = Path(tempfile.gettempdir()).resolve()
+        root_temp_dir = _default_temp_root()
         self.temp_location = temp_location or str(root_temp_dir / temp_dir_name)
 
+        # If `unique=True`, every run (in every process) derives its own temporary location from the base location,
+        # so that conduits sharing the same location (e.g. under `ParallelConduits`) do not clobber each other.
+        self.unique = unique
+        self._base_temp_location = self.temp_location
+
     @abstractmethod
     def write_result(self, result: Result, node_label: str, *args, **kwargs) -> None:
         pass
@@ -68,6 +177,25 @@ class ResultIO(ABC):
     def read_result(self, node_label: str, result_kind: type[Result], *args, **kwargs) -> Result:
         pass
 
+    # Temporary location hooks used by the conduits. These are no-ops by default, for the
+    # ResultIOs that do not store the results in a location (e.g. `MemoryResultIO`).
+    def create_temp_location(self, *args, **kwargs) -> None:
+        pass
+
+    def delete_temp_location(self, *args, **kwargs) -> None:
+        pass
+
+    def transfer_results(self, destination_dir: str) -> None:
+        pass
+
+    def prepare_for_labels(self, node_labels: Iterable[str]) -> None:
+        """Called by the conduits with the labels of all the nodes, before a run."""
+        pass
+
+    def flush(self) -> None:
+        """Called by the conduits whenever a batch of nodes is complete, for the ResultIOs that buffer their writes."""
+        pass
+
 
 class MemoryResultIO(ResultIO):
     def __init__(self):
@@ -81,36 +209,201 @@ class MemoryResultIO(ResultIO):
         return self._result_storage[node_label]
 
 
-class LocalFsCrudMeta(ABCMeta):
-    def __new__(mcls, name: str, bases: tuple, attrs: dict):
-        assert ResultIO in bases, "ResultIO is not inherited."
+class SharedMemoryResultIO(ResultIO):
+    """Pickled results in shared memory blocks, readable from any process holding a copy of the ResultIO.
+
+    The blocks are closed as soon as they are written or read, so that large DAGs do not hold a file descriptor per
+    node. Note: This relies on POSIX shared memory, which persists until it is unlinked (on Windows, a block is freed
+    once its last handle is closed).
+    """
+    # Size of the pickled result at the start of each block, as blocks may be rounded up to the page size
+    header = struct.Struct("<Q")
+
+    def __init__(self, name_prefix: str = "dag", unique: bool = False):
+        # The temporary location is the namespace of the block names (kept short, as some
+        # platforms limit the length of the names of shared memory blocks)
+        super().__init__(f"{name_prefix}-{uuid.uuid4().hex[:8]}", name_prefix, unique)
+        self._name_prefix = name_prefix
+        # Results written or read in this process, keyed by node label
+        self._cache: dict[str, Result] = dict()
+        # Labels of the blocks to unlink, including the ones only written by other processes
+        self._labels: set[str] = set()
+
+    def __getstate__(self) -> dict:
+        # Every process caches the results on its own
+        state = self.__dict__.copy()
+        state["_cache"] = dict()
+        return state
+
+    def block_name(self, node_label: str) -> str:
+        # Deterministic, so that other processes find the block of a node without any lookup
+        digest = hashlib.blake2b(node_label.encode(), digest_size=6).hexdigest()
+        return f"{self.temp_location}-{digest}"
+
+    def create_temp_location(self, *args, **kwargs) -> None:
+        if self.unique:
+            # A short hash of the run, so that the unique block names are no longer than the base ones
+            # (e.g. macOS limits the names to 31 characters)
+            run_key = f"{self._base_temp_location}-{os.getpid()}-{uuid.uuid4().hex}".encode()
+            self.temp_location = f"{self._name_prefix}-{hashlib.blake2b(run_key, digest_size=4).hexdigest()}"
+        # Start the resource tracker before any worker process, so that the workers share it. The tracker
+        # then unlinks the blocks that are left behind by a crashed run, while every block is unregistered
+        # exactly once, by the `unlink` in `delete_temp_location`.
+        resource_tracker.ensure_running()
+
+    def delete_temp_location(self, *args, **kwargs) -> None:
+        for node_label in self._labels | set(self._cache):
+            try:
+                self._unlink_block(node_label)
+            except OSError:
+                # Keep unlinking the other blocks (the resource tracker unlinks the ones left behind)
+                pass
+        self._cache.clear()
+        self._labels.clear()
+
+    def prepare_for_labels(self, node_labels: Iterable[str]) -> None:
+        # The blocks of these labels are unlinked by `delete_temp_location`, even if they
+        # were created by other processes (e.g. the workers of a process pool executor)
+        self._labels.update(node_labels)
+
+    def _unlink_block(self, node_label: str) -> None:
+        try:
+            shm = shared_memory.SharedMemory(self.block_name(node_label))
+        except FileNotFoundError:
+            return
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def write_result(self, result: Result, node_label: str) -> None:
+        self._cache[node_label] = result
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        size = self.header.size + len(payload)
+
+        self._unlink_block(node_label)
+        shm = shared_memory.SharedMemory(self.block_name(node_label), create=True, size=size)
+        self._labels.add(node_label)
+        try:
+            self.header.pack_into(shm.buf, 0, len(payload))
+            shm.buf[self.header.size:size] = payload
+        finally:
+            shm.close()
+
+    def read_result(self, node_label: str, result_kind: type[Result]) -> Result:
+        if node_label in self._cache:
+            return self._cache[node_label]
+
+        shm = shared_memory.SharedMemory(self.block_name(node_label))
+        try:
+            (payload_size,) = self.header.unpack_from(shm.buf, 0)
+            result = pickle.loads(shm.buf[self.header.size:self.header.size + payload_size])
+        finally:
+            shm.close()
+        self._cache[node_label] = result
+        return result
 
-        # Flag if results need to be transfered to
-        # another directory before deletion.
-        attrs["use_transfer_results"] = False
 
-        attrs["read_results"] = mcls.read_results
-        attrs["create_temp_location"] = mcls.create_temp_location
-        attrs["delete_temp_location"] = mcls.delete_temp_location
-        attrs["file_path"] = mcls.file_path
-        attrs["transfer_results"] = mcls.transfer_results
+class LocalResultIO(ResultIO):
+    file_extension: str = "json"
+    supports_transfer: bool = True
+
+    # Flag if results need to be transfered to
+    # another directory before deletion.
+    use_transfer_results: bool = False
+
+    def __init__(self, temp_location: Optional[str] = None, name_prefix: str = "dag", unique: bool = False):
+        super().__init__(temp_location, name_prefix, unique)
+        # Results written or read in this process, keyed by node label. The files are still written for
+        # durability, but readers in the same process skip the file IO and the deserialization.
+        self._cache: dict[str, Result] = dict()
+        # `temp_location` encoded once, and the encoded file path of every node label, for `_raw_file_path`.
+        # Both are refreshed whenever the location changes.
+        self._temp_location_key: str = self.temp_location
+        self._temp_location_bytes: bytes = os.fsencode(self.temp_location)
+        self._paths: dict[str, bytes] = dict()
+
+    def _raw_file_path(self, node_label: str) -> bytes:
+        # Same file as `file_path`, built without the `Path` objects and the `resolve()` syscalls
+        if self._temp_location_key != self.temp_location:
+            self._temp_location_key = self.temp_location
+            self._temp_location_bytes = os.fsencode(self.temp_location)
+            self._paths.clear()
+        path = self._paths.get(node_label)
+        if path is None:
+            path = os.path.join(self._temp_location_bytes, os.fsencode(f"{node_label}.{self.file_extension}"))
+            self._paths[node_label] = path
+        return path
+
+    def prepare_for_labels(self, node_labels: Iterable[str]) -> None:
+        for node_label in node_labels:
+            self._raw_file_path(node_label)
+
+    def __getstate__(self) -> dict:
+        # Every process caches the results on its own
+        state = self.__dict__.copy()
+        state["_cache"] = dict()
+        return state
+
+    def encode_result(self, result: Result) -> bytes:
+        if isinstance(result, JsonResult) and type(result).serialize is JsonResult.serialize:
+            return result.serialize_bytes()
+        payload = result.serialize()
+        if isinstance(payload, str):
+            payload = payload.encode()
+        return payload
+
+    def decode_result(self, data: bytes, result_kind: type[Result]) -> Result:
+        if issubclass(result_kind, JsonResult) and result_kind.deserialize.__func__ is JsonResult.deserialize.__func__:
+            # Parsed from the bytes, without decoding them to `str` first
+            return result_kind.deserialize(data)
+        return result_kind.deserialize(data.decode())
 
-        new_cls = super().__new__(mcls, name, bases, attrs)
-        return new_cls
+    def write_result(self, result: Result, node_label: str) -> None:
+        self._cache[node_label] = result
+        payload = self.encode_result(result)
+        fd = os.open(self._raw_file_path(node_label), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+
+    def read_result(self, node_label: str, result_kind: type[Result]) -> Result:
+        if node_label in self._cache:
+            return self._cache[node_label]
+
+        # Read with the size from `fstat`, in a single `read` for most files
+        fd = os.open(self._raw_file_path(node_label), os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            data = os.read(fd, size)
+            while len(data) < size:
+                chunk = os.read(fd, size - len(data))
+                if not chunk:
+                    break
+                data += chunk
+        finally:
+            os.close(fd)
+
+        result = self.decode_result(data, result_kind)
+        self._cache[node_label] = result
+        return result
 
-    @staticmethod
     def read_results(self, node_labels: list[str], *args, **kwargs) -> list[Result]:
         return [self.read_result(node_label, *args, **kwargs) for node_label in node_labels]
 
-    @staticmethod
     def create_temp_location(self, *args, **kwargs) -> None:
+        if self.unique:
+            self.temp_location = f"{self._base_temp_location}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
         os.makedirs(self.temp_location, *args, **kwargs)
 
-    @staticmethod
     def delete_temp_location(self, *args, ignore_errors=True, **kwargs) -> None:
+        self._cache.clear()
         shutil.rmtree(self.temp_location, *args, ignore_errors=ignore_errors, **kwargs)
 
-    @staticmethod
     def transfer_results(self, destination_dir: str) -> None:
         dest_dir_path = Path(destination_dir).resolve()
         src_dir_path = Path(self.temp_location).resolve()
@@ -122,9 +415,9 @@ class LocalFsCrudMeta(ABCMeta):
         if not dest_dir_path.is_dir():
             raise ValueError("The given destination directory is not a directory.")
 
+        self._cache.clear()
         shutil.move(src_dir_path, dest_dir_path)
 
-    @staticmethod
     def file_path(self, node_label: str, file_extension: str | None = None) -> Path:
         temp_dir_path = Path(self.temp_location).resolve()
         if file_extension:
@@ -133,15 +426,125 @@ class LocalFsCrudMeta(ABCMeta):
             return temp_dir_path / f"{node_label}"
 
 
-class LocalResultIO(ResultIO, metaclass=LocalFsCrudMeta):
-    file_extension: str = "json"
+class PickleResultIO(LocalResultIO):
+    """LocalResultIO storing the pickled results instead of their serialization (e.g. JSON)."""
+    file_extension: str = "pkl"
+
+    def encode_result(self, result: Result) -> bytes:
+        return pickle.dumps(result, protocol=5)
+
+    def decode_result(self, data: bytes, result_kind: type[Result]) -> Result:
+        return pickle.loads(data)
+
+
+def _write_all(fd: int, payloads: list[bytes]) -> None:
+    # Write the payloads with as few system calls as possible, resuming after partial writes
+    if not hasattr(os, "writev"):
+        payloads = [b"".join(payloads)]
+    iov_max = 1024
+    while payloads:
+        chunk = payloads[:iov_max]
+        written = os.writev(fd, chunk) if len(chunk) > 1 else os.write(fd, chunk[0])
+        for idx, payload in enumerate(chunk):
+            if written < len(payload):
+                payloads = [payload[written:]] + payloads[idx + 1:]
+                break
+            written -= len(payload)
+        else:
+            payloads = payloads[len(chunk):]
+
+
+class WaveBufferedResultIO(LocalResultIO):
+    """LocalResultIO appending the results to a single log file, with one batched write per `flush`.
+
+    The offsets of the results in the log are only known to the process that flushed them, which is always the
+    process of the conduit: with a process pool executor, only the callbacks run in the worker processes.
+    """
+    log_file_name: str = "results.log"
+    index_file_name: str = "results.index.json"
+
+    def __init__(self, temp_location: Optional[str] = None, name_prefix: str = "dag", unique: bool = False):
+        super().__init__(temp_location, name_prefix, unique)
+        self._lock = threading.Lock()
+        # Encoded results written since the last flush, keyed by node label
+        self._buffer: dict[str, bytes] = dict()
+        # Offset and size of every flushed result in the log, keyed by node label
+        self._offsets: dict[str, tuple[int, int]] = dict()
+        self._log_fd: int | None = None
+        self._log_size = 0
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state["_lock"] = None
+        state["_buffer"] = dict()
+        state["_log_fd"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
     def write_result(self, result: Result, node_label: str) -> None:
-        file_path = self.file_path(node_label, file_extension=self.file_extension)
-        file_path.write_text(result.serialize())
+        payload = self.encode_result(result)
+        with self._lock:
+            self._cache[node_label] = result
+            self._buffer[node_label] = payload
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._buffer:
+                return
+            if self._log_fd is None:
+                log_path = os.path.join(os.fsencode(self.temp_location), os.fsencode(self.log_file_name))
+                self._log_fd = os.open(log_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+
+            payloads = list(self._buffer.values())
+            offset = self._log_size
+            for node_label, payload in zip(self._buffer, payloads):
+                self._offsets[node_label] = (offset, len(payload))
+                offset += len(payload)
+            self._buffer.clear()
+
+            _write_all(self._log_fd, payloads)
+            self._log_size = offset
 
     def read_result(self, node_label: str, result_kind: type[Result]) -> Result:
-        file_path = self.file_path(node_label, file_extension=self.file_extension)
-        obj_str = file_path.read_text()
-        result = result_kind.deserialize(obj_str)
+        if node_label in self._cache:
+            return self._cache[node_label]
+
+        with self._lock:
+            payload = self._buffer.get(node_label)
+            if payload is None:
+                if node_label not in self._offsets:
+                    raise FileNotFoundError(f"No result was written for the node {node_label}.")
+                offset, size = self._offsets[node_label]
+                payload = os.pread(self._log_fd, size, offset)
+
+        result = self.decode_result(payload, result_kind)
+        self._cache[node_label] = result
         return result
+
+    def _close_log(self) -> None:
+        if self._log_fd is not None:
+            os.close(self._log_fd)
+            self._log_fd = None
+
+    def create_temp_location(self, *args, **kwargs) -> None:
+        super().create_temp_location(*args, **kwargs)
+        self._close_log()
+        self._buffer.clear()
+        self._offsets.clear()
+        self._log_size = 0
+
+    def delete_temp_location(self, *args, **kwargs) -> None:
+        self._close_log()
+        super().delete_temp_location(*args, **kwargs)
+
+    def transfer_results(self, destination_dir: str) -> None:
+        # The transferred log is only readable with the offsets of its results
+        self.flush()
+        index_path = Path(self.temp_location) / self.index_file_name
+        index_path.write_text(json.dumps(self._offsets))
+        self._close_log()
+        super().transfer_results(destination_dir)
+